@@ -32,9 +32,12 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
+from ectools import load_csv
 
 # Read the homes dataset
-df_homes = pd.read_csv("data/homes.csv")
+# load_csv works like pd.read_csv, but caches a binary copy in temp/cache/
+# so that later runs skip parsing the CSV
+df_homes = load_csv("data/homes.csv")
 
 # Keep only the following six cities
 df_homes = df_homes[
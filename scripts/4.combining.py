@@ -316,6 +316,8 @@ print("Combined ratings data sample:")
 print(combined_data.head(10))
 
 # Calculate average ratings by genre and age group
+# (With millions of ratings, the exact "nunique" is the slow part here;
+#  ectools.sketches.GroupedHyperLogLog gives approximate distinct counts)
 summary_stats = (
     combined_data.groupby(["genre", "user_age_group"])
     .agg({"rating": ["mean", "count"], "user_id": "nunique"})
@@ -26,12 +26,13 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
+from ectools import load_csv
 
 # Load the ratings dataset
-df_ratings = pd.read_csv("data/ratings.csv")
-
-# Convert date column to datetime if it's not already
-df_ratings["date"] = pd.to_datetime(df_ratings["date"])
+# dates=True gives us the date column already parsed (from day numbers
+# stored in the cache), plus date_days, date_year, date_month and
+# date_months, so later runs do not parse a single date string
+df_ratings = load_csv("data/ratings.csv", dates=True)
 
 print(df_ratings.head())
 
@@ -47,9 +48,10 @@ print(f"Columns: {df_ratings.columns.tolist()}")
 ## 2. Preprocessing
 ###########################
 
-# Let's use pandas datetime functionality to add some useful info
-df_ratings["date_month"] = df_ratings["date"].dt.month
-df_ratings["date_year"] = df_ratings["date"].dt.year
+# The year and month of every rating came with load_csv(..., dates=True).
+# Without the cache, pandas datetime functionality gives the same columns:
+#   df_ratings["date_month"] = df_ratings["date"].dt.month
+#   df_ratings["date_year"] = df_ratings["date"].dt.year
 
 print("Sample of processed data:")
 print(df_ratings.head())
@@ -93,6 +95,8 @@ print(f"Standard deviation (2015-2016): {ratings_subset['score'].std():.2f}")
 # 4.1 Computing summary statistics over time
 # ----------------------
 # Compute summary statistics for the ratings grouped by year and month
+# (When the ratings do not fit in memory, ectools.buckets.ratings_evolution()
+#  builds this same table, with the SE and t columns, in one read of the file)
 df_ratings_evolution = (
     df_ratings.groupby(["date_year", "date_month"])
     .agg({"score": ["count", "mean", "var"]})
@@ -199,6 +203,8 @@ print(f"Final average score: {final_score:.3f}")
 print(f"Total percentage increase: {total_increase:.2f}%")
 
 # Look at the difference between early and late periods
+# (ectools.pyramid.TimePyramid keeps day/week/month/quarter/year totals, so
+#  comparisons like this one can be answered without going over the rows)
 early_period = df_ratings_evolution[df_ratings_evolution["date_year"] <= 2010][
     "score_mean"
 ].mean()
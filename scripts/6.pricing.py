@@ -26,9 +26,10 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
+from ectools import load_csv
 
 # Load the prices dataset
-df_prices = pd.read_csv("data/prices.csv")
+df_prices = load_csv("data/prices.csv")
 
 # Note: time_m represents time periods as numbers, not dates
 # So we keep it as numeric for calculations
@@ -57,6 +58,8 @@ print(f"Total observations: {len(df_prices)}")
 # ----------------------
 # For each car, we want to know how many times they changed their price
 # relative to how long they were in the dataset
+# (If the prices file is too large for memory, ectools.streaming.car_changes()
+#  builds this same table by reading the file in blocks)
 
 df_changes = (
     df_prices.groupby("car").agg({"time_m": ["count", "min", "max"]}).reset_index()
@@ -72,6 +75,8 @@ if df_changes["start_t"].dtype == "datetime64[ns]":
     df_changes["end_t"] = pd.to_numeric(df_changes["end_t"])
 
 # Calculate price changes rate
+# Note: n counts observations, so this is really observations per period.
+# ectools.pricechanges.price_changes() compares consecutive prices instead.
 df_changes["price_changes"] = df_changes["n"] / (
     df_changes["end_t"] - df_changes["start_t"] + 1
 )
@@ -224,6 +229,9 @@ plt.close()
 # ----------------------
 # 2.5.3 Price changes vs time in market
 # ----------------------
+# Note: cars still listed in the last period have not left yet, so their
+# time in market is a lower bound. ectools.survival.kaplan_meier() takes
+# that into account when estimating how long cars stay.
 plt.figure(figsize=(10, 6))
 plt.scatter(
     pd.to_numeric(df_changes["end_t"]) - pd.to_numeric(df_changes["start_t"]) + 1,
@@ -288,6 +296,9 @@ for category, count in df_changes["score_bins"].value_counts().sort_index().item
 # 2.7.1 Time series of average price changes
 # ----------------------
 # Calculate average price changes over time
+# (For very large panels, ectools.sketches.GroupedHyperLogLog("time_m", "car")
+#  estimates these distinct counts chunk by chunk, with a standard error of
+#  about 1.6%, so a few percent off for the worst of many groups)
 time_series_changes = (
     df_prices.groupby("time_m")
     .agg({"car": "nunique"})  # Number of unique cars active in each period
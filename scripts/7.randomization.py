@@ -25,11 +25,12 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
+from ectools import load_csv
 
 # This is user data simulated from a real marketplace
 # We have two goals: (i) to perform randomized assignment
 # (ii) to check our randomized assignment was "correct"
-df_users = pd.read_csv("data/users.csv")
+df_users = load_csv("data/users.csv")
 
 print("Dataset loaded successfully!")
 print(f"Dataset shape: {df_users.shape}")
@@ -106,6 +107,15 @@ df_assignment = (
 print("Assignment counts (exact split):")
 print(df_assignment)
 
+# Both approaches depend on the seed and on the order of the rows.
+# Online platforms instead hash each user's ID, so that a user's group
+# can be recomputed at any time, e.g.
+#   ectools.assignment.Experiment("new_feature").assign(df_users["user"])
+# and .assign_stratified(df_users, ["city", "gender"]) splits every
+# city x gender group exactly in half (see section 3 on balance).
+# A website asks a service for the group of each arriving user:
+# `make serve` answers with the same hash (ectools.server).
+
 
 ########################
 ## 3. Balance tests
@@ -120,6 +130,8 @@ print(df_assignment)
 # Luckily, there is an easy way that is called "balance tests"
 # If randomized assignment was performed correctly, then the treatment groups should be similar
 # with respect to the attributes we can observe.
+# (If they are not, we can draw again until they are: see ectools.rerandomize,
+#  which scores thousands of candidate assignments at once)
 
 # ----------------------
 # 3.2 Gender balance test
@@ -212,6 +224,9 @@ print(f"P-value: {earnings_ttest.pvalue:.4f}")
 # 3.6 Multiple balance tests summary
 # ----------------------
 # Create a comprehensive balance table
+# (ectools.balance.numeric_balance() and categorical_balance() build this
+#  table, with Welch t-tests and chi-square tests, for many variables and
+#  arms at once)
 
 # Continuous variables balance
 continuous_vars = ["age", "earnings"]
@@ -25,6 +25,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
+from ectools import load_csv
 
 # This is user data simulated from a real marketplace
 # We want to analyze and visualize the results of
@@ -33,7 +34,7 @@ import seaborn as sns
 # - The treatment group had the "new" pricing algorithm that we want to evaluate
 # - Earnings tell us how much each user made at the end of a three month period
 
-df_users = pd.read_csv("data/earnings.csv")
+df_users = load_csv("data/earnings.csv")
 
 print("Dataset loaded successfully!")
 print(f"Dataset shape: {df_users.shape}")
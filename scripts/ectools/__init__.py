@@ -0,0 +1,22 @@
+"""Shared helpers for the class scripts.
+
+The scripts in this folder import from here, e.g.
+
+    from ectools import load_csv
+    df_prices = load_csv("data/prices.csv")
+"""
+
+from ectools.cache import load_csv, open_csv
+from ectools.colstore import ColumnTable, open_table, write_table
+from ectools.dtypes import apply_dtype_plan, compact_dtypes, dtype_plan
+
+__all__ = [
+    "ColumnTable",
+    "apply_dtype_plan",
+    "compact_dtypes",
+    "dtype_plan",
+    "load_csv",
+    "open_csv",
+    "open_table",
+    "write_table",
+]
@@ -0,0 +1,199 @@
+###########################################################
+# 🎓 Professor: Apostolos Filippas
+# 📘 Class:     E-Commerce
+# 📋 Topic:     Treatment assignment by hashing
+# 🚫 Note:      Please do not share this script with people
+#               outside the class without my permission.
+###########################################################
+
+# np.random.uniform in 7.randomization.py gives each user a random
+# number, but which number a user gets depends on the seed, on the row
+# order, and on every other random draw made before. To find one
+# user's group we must redo the whole assignment.
+#
+# Instead, we compute each user's number from the user ID itself:
+#
+#   number = hash(experiment, user ID)
+#
+# A good hash looks random, so half of the users still land above 0.5.
+# But the same user always gets the same number, in any order, in a
+# batch of millions or on their own, on any machine. Using the
+# experiment's name (and an optional salt) in the hash gives every
+# experiment an independent assignment.
+#
+# Arms are then picked by cutting [0, 1) by the split weights, e.g.
+# weights (1, 1) -> Control below 0.5, Treatment above. We work with
+# integers (53 bits of the hash) rather than floats, so the cut points
+# and the result are exactly the same everywhere.
+#
+# Stratified assignment: hashing splits each city or age group only
+# roughly in half. To split every stratum exactly, we sort the users by
+# (stratum, hash), which shuffles each stratum, and give the first
+# share of each stratum to Control, the next to Treatment, and so on.
+# When a stratum does not split evenly (say 7 users, 50/50), the extra
+# user goes to the arm with the largest remainder ("largest remainder"
+# rounding), with ties broken at random.
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from ectools.groupindex import GroupIndex
+from ectools.hashing import integer_ids, mix64
+
+HASH_BITS = 53  # Bits of the hash used to pick an arm
+GOLDEN = np.uint64(0x9E3779B97F4A7C15)  # 2**64 / golden ratio, as in splitmix64
+
+
+def experiment_key(name, salt=""):
+    """A 64-bit number that identifies an experiment (and its salt)"""
+    digest = hashlib.blake2b(f"{name}\0{salt}".encode(), digest_size=8).digest()
+    return np.uint64(int.from_bytes(digest, "little"))
+
+
+def hash_users(users, key):
+    """64-bit hash of every (experiment key, user ID) pair
+
+    Integer IDs are mixed directly (fast), and so are whole numbers of
+    any dtype: 42.0 (e.g. from a column with missing IDs, or from JSON)
+    is user 42. Other IDs, e.g. strings, are first hashed with
+    pd.util.hash_array. 7 and "7" are different users.
+    """
+    users = np.asarray(users)
+    if users.dtype.kind in "iu":
+        ids = users.astype(np.uint64)
+    else:
+        whole, ints = integer_ids(users)
+        ids = np.empty(len(users), dtype=np.uint64)
+        ids[whole] = ints.astype(np.uint64)
+        if not whole.all():
+            ids[~whole] = pd.util.hash_array(users[~whole].astype(object))
+    # The splitmix64 generator: element `id` of the stream seeded by `key`
+    return mix64(ids * GOLDEN + key)
+
+
+class Experiment:
+    """Deterministic assignment of users to arms
+
+    experiment = Experiment("new_feature", weights=[1, 1])
+    df_users["treatment"] = experiment.assign(df_users["user"])
+    experiment.assign_one(42)          # the same answer as in the batch
+    """
+
+    def __init__(self, name, arms=("Control", "Treatment"), weights=None, salt=""):
+        self.name = name
+        self.salt = salt
+        self.arms = np.asarray(arms)
+        weights = np.ones(len(arms)) if weights is None else np.asarray(weights)
+        weights = weights.astype(np.float64)
+        if not np.isfinite(weights).all():
+            raise ValueError("Weights must be finite numbers")
+        if len(weights) != len(arms) or (weights < 0).any() or weights.sum() <= 0:
+            raise ValueError("Need one non-negative weight per arm")
+        self.weights = weights / weights.sum()
+
+        # Integer cut points: arm i gets buckets [cuts[i - 1], cuts[i])
+        scale = 2**HASH_BITS
+        self.cuts = np.round(np.cumsum(self.weights) * scale).astype(np.uint64)
+        self.cuts[-1] = scale
+        self.key = experiment_key(name, salt)
+
+    def __repr__(self):
+        weights = ", ".join(f"{a}={w:g}" for a, w in zip(self.arms, self.weights))
+        return f"Experiment({self.name!r}, {weights})"
+
+    def buckets(self, users):
+        """Each user's integer bucket, between 0 and 2**53"""
+        return hash_users(users, self.key) >> np.uint64(64 - HASH_BITS)
+
+    def uniform(self, users):
+        """Each user's number in [0, 1), a stand-in for np.random.uniform"""
+        return self.buckets(users) / 2**HASH_BITS
+
+    def arm_index(self, users):
+        """Arm number of every user"""
+        buckets = self.buckets(users)
+        # One comparison per cut point (faster than np.searchsorted)
+        index = np.zeros(len(buckets), dtype=np.int64)
+        for cut in self.cuts[:-1]:
+            index += buckets >= cut
+        return index
+
+    def assign(self, users):
+        """Arm label of every user"""
+        return self.arms[self.arm_index(users)]
+
+    def assign_one(self, user):
+        return self.assign([user])[0]
+
+    def quotas(self, sizes):
+        """Users per (stratum, arm): exact shares, rounded by largest remainder"""
+        sizes = np.asarray(sizes, dtype=np.int64)
+        exact = sizes[:, None] * self.weights
+        quotas = np.floor(exact).astype(np.int64)
+        left = sizes - quotas.sum(axis=1)
+
+        # Hand out the leftover users by remainder, ties in random order
+        cells = np.arange(sizes.size * len(self.arms)).reshape(len(sizes), -1)
+        tiebreak = hash_users(cells.ravel(), self.key).reshape(cells.shape)
+        order = np.lexsort((tiebreak, quotas - exact), axis=1)
+        rank = np.empty_like(order)
+        np.put_along_axis(rank, order, np.arange(len(self.arms))[None, :], axis=1)
+        return quotas + (rank < left[:, None])
+
+    def assign_stratified(self, df, strata, user="user", bins=None):
+        """Arm of every user, with exact splits within each stratum
+
+        `strata` are column names; `bins` maps continuous columns to a
+        number of quantile bins or to a list of bin edges, e.g.
+        bins={"age": 4, "earnings": [0, 50, 100, np.inf]}. Values
+        outside the edges raise a ValueError (use -np.inf or np.inf for
+        an open-ended bin). Missing values form a stratum of their own.
+        """
+        keys = []
+        for column in [strata] if isinstance(strata, str) else strata:
+            values = df[column]
+            if bins and column in bins:
+                values = _bin(values.to_numpy(dtype=np.float64), bins[column])
+            keys.append(pd.factorize(values, sort=True, use_na_sentinel=False)[0])
+        groups = GroupIndex(*keys)
+
+        # Shuffle within strata: sort by (stratum, hash of the user)
+        hashes = hash_users(df[user].to_numpy(), self.key)
+        order = np.lexsort((hashes, groups.codes))
+        rank = np.arange(len(order)) - groups.offsets[groups.codes[order]]
+
+        # Strata are numbered in sorted order, so the quotas (and their
+        # tie-breaks) do not depend on the order of the rows either
+        cuts = np.cumsum(self.quotas(groups.size()), axis=1)
+        stratum = groups.codes[order]
+        index = np.zeros(len(order), dtype=np.int64)
+        for arm in range(len(self.arms) - 1):
+            index += rank >= cuts[stratum, arm]
+
+        arms = np.empty(len(order), dtype=self.arms.dtype)
+        arms[order] = self.arms[index]
+        return arms
+
+
+def _bin(values, bins):
+    """Bin number of every value (NaN for missing values)
+
+    `bins` is a number of quantile bins or a list of edges, which must
+    cover every value: bin i holds edges[i] <= value < edges[i + 1]
+    (and the last bin its upper edge too).
+    """
+    if np.isscalar(bins):
+        edges = np.nanquantile(values, np.linspace(0, 1, bins + 1))
+    else:
+        edges = np.asarray(bins, dtype=np.float64)
+        outside = (values < edges[0]) | (values > edges[-1])
+        if outside.any():
+            raise ValueError(
+                f"{outside.sum():,} values outside the bin edges "
+                f"[{edges[0]:g}, {edges[-1]:g}]; add -np.inf or np.inf edges"
+            )
+    which = np.searchsorted(edges[1:-1], values, side="right").astype(np.float64)
+    which[np.isnan(values)] = np.nan
+    return which
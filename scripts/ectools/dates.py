@@ -0,0 +1,97 @@
+###########################################################
+# 🎓 Professor: Apostolos Filippas
+# 📘 Class:     E-Commerce
+# 📋 Topic:     Dates as integers
+# 🚫 Note:      Please do not share this script with people
+#               outside the class without my permission.
+###########################################################
+
+# pd.to_datetime has to parse every "2009-08-31" string of a column,
+# every time we load the data. But a date column has few distinct
+# values (one per day), and each one only needs parsing once.
+#
+# When the column store (colstore.py) saves a column of ISO dates, it
+# also saves four number columns next to it:
+#
+#   date_days   -> days since 1970-01-01
+#   date_year   -> 2009
+#   date_month  -> 8
+#   date_months -> months since January 1970, for grouping by month
+#
+# Grouping by month is then integer arithmetic, e.g. the month index
+# of 5.inflation.py is t = date_months - 12 * (2007 - 1970) + 1.
+#
+# The four columns are int32, so years print as 2009 and not 2009.0.
+# Missing dates are stored as MISSING (the smallest int32), so rows
+# with and without missing dates can be appended to the same table.
+# Strings that look like dates but are not valid ones (2017-02-30, or
+# years pandas cannot represent, like 1500) are missing dates too.
+#
+# When we read a part back, a column without missing dates is a plain
+# int32 array, and one with missing dates a pandas "Int32" column,
+# which shows them as <NA> (groupby leaves them out, as it does NaN).
+
+import re
+
+import numpy as np
+import pandas as pd
+
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+DATE_PARTS = ["days", "year", "month", "months"]
+DATE_DTYPE = np.int32
+MISSING = np.iinfo(np.int32).min  # Stored for missing or invalid dates
+
+
+def is_date_column(categories):
+    """Whether every distinct value is an ISO date (YYYY-MM-DD)"""
+    return len(categories) > 0 and all(ISO_DATE.fullmatch(c) for c in categories)
+
+
+def date_parts(strings):
+    """The parts of every date string, one float64 array per part (NaN if invalid)"""
+    dates = pd.to_datetime(pd.Series(strings), format="%Y-%m-%d", errors="coerce")
+    year = dates.dt.year.to_numpy(dtype=np.float64)
+    month = dates.dt.month.to_numpy(dtype=np.float64)
+    days = dates.to_numpy().astype("datetime64[D]").astype(np.int64)
+    days = np.where(dates.isna().to_numpy(), np.nan, days)
+    return {
+        "days": days,
+        "year": year,
+        "month": month,
+        "months": 12 * (year - 1970) + month - 1,
+    }
+
+
+def coded_date_parts(codes, categories):
+    """int32 date parts of a dictionary-encoded column (codes -1 are missing)
+
+    Only the distinct strings are parsed; each row looks up its code.
+    """
+    parts = date_parts(categories)
+    missing = codes < 0
+    result = {}
+    for part in DATE_PARTS:
+        values = parts[part][np.maximum(codes, 0)] if len(categories) else codes
+        values = np.where(missing | np.isnan(values), MISSING, values)
+        result[part] = values.astype(DATE_DTYPE)
+    return result
+
+
+def part_values(stored):
+    """A stored date part as int32, or as pandas Int32 if some dates are missing"""
+    stored = np.asarray(stored)
+    missing = stored == MISSING
+    if not missing.any():
+        return stored
+    return pd.arrays.IntegerArray(
+        np.where(missing, 0, stored).astype(np.int32), missing
+    )
+
+
+def days_to_datetime(days):
+    """datetime64 values from days since 1970-01-01 (MISSING or NaN become NaT)"""
+    days = np.asarray(days)
+    valid = ~np.isnan(days) if days.dtype.kind == "f" else days != MISSING
+    dates = np.full(len(days), np.datetime64("NaT"), dtype="datetime64[ns]")
+    dates[valid] = days[valid].astype(np.int64).astype("datetime64[D]")
+    return dates
@@ -0,0 +1,167 @@
+###########################################################
+# 🎓 Professor: Apostolos Filippas
+# 📘 Class:     E-Commerce
+# 📋 Topic:     Load-testing the assignment service
+# 🚫 Note:      Please do not share this script with people
+#               outside the class without my permission.
+###########################################################
+
+# How fast is server.py? We open a number of connections at once (the
+# "concurrency"), and on each one send requests back to back for a few
+# seconds, timing every request. Then we report:
+#
+#   rps      -> requests answered per second
+#   p50, p99 -> the latency that half (99%) of the requests stay under
+#
+# The average hides the slow requests that users notice, so services
+# are usually judged by p99. Requests are either single users (GET) or
+# batches of users (POST with --batch).
+#
+# With --check we first compare the service's answers with
+# Experiment.assign run right here; they must be identical.
+#
+#   python -m ectools.loadtest --concurrency 32 --seconds 10 --batch 100
+
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import quote
+
+import numpy as np
+
+from ectools.assignment import Experiment
+
+
+async def connect(host="127.0.0.1", port=8000, unix=None):
+    if unix:
+        return await asyncio.open_unix_connection(unix)
+    return await asyncio.open_connection(host, port)
+
+
+async def request(reader, writer, method, target, payload=None):
+    """Send one request on an open connection; returns (status, JSON answer)"""
+    body = b"" if payload is None else json.dumps(payload).encode()
+    writer.write(
+        f"{method} {target} HTTP/1.1\r\n"
+        "Host: localhost\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "\r\n".encode() + body
+    )
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def _client(address, experiment, batch, users, seed, stop_at, latencies):
+    """Send requests on one connection until stop_at; returns the error count"""
+    rng = np.random.default_rng(seed)
+    reader, writer = await connect(**address)
+    errors = 0
+    try:
+        while time.perf_counter() < stop_at:
+            ids = rng.integers(0, users, size=batch).tolist()
+            start = time.perf_counter()
+            if batch == 1:
+                target = f"/assign?experiment={quote(experiment)}&user={ids[0]}"
+                status, _ = await request(reader, writer, "GET", target)
+            else:
+                payload = {"experiment": experiment, "users": ids}
+                status, _ = await request(reader, writer, "POST", "/assign", payload)
+            latencies.append(time.perf_counter() - start)
+            errors += status != 200
+    finally:
+        writer.close()
+    return errors
+
+
+async def check(address, experiment, users=10_000, seed=0):
+    """Number of users whose arm differs between the service and Experiment"""
+    ids = np.random.default_rng(seed).integers(0, 2**40, size=users)
+    reader, writer = await connect(**address)
+    try:
+        payload = {"experiment": experiment, "users": ids.tolist()}
+        _, answer = await request(reader, writer, "POST", "/assign", payload)
+        target = f"/assign?experiment={quote(experiment)}&user={ids[0]}"
+        _, single = await request(reader, writer, "GET", target)
+    finally:
+        writer.close()
+    offline = Experiment(experiment).assign(ids)
+    mismatches = int((np.asarray(answer["arms"]) != offline).sum())
+    return mismatches + (single["arm"] != offline[0])
+
+
+async def run(address, experiment, concurrency=16, seconds=5.0, batch=1, users=10**6):
+    """Load-test the service; returns a dict of results"""
+    latencies = []
+    start = time.perf_counter()
+    stop_at = start + seconds
+    errors = await asyncio.gather(
+        *[
+            _client(address, experiment, batch, users, seed, stop_at, latencies)
+            for seed in range(concurrency)
+        ]
+    )
+    elapsed = time.perf_counter() - start
+    ms = np.asarray(latencies) * 1000
+    return {
+        "requests": len(ms),
+        "errors": sum(errors),
+        "rps": len(ms) / elapsed,
+        "users_per_second": len(ms) * batch / elapsed,
+        "p50_ms": np.percentile(ms, 50),
+        "p99_ms": np.percentile(ms, 99),
+        "max_ms": ms.max(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the assignment service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--unix", help="Connect to this Unix socket instead")
+    parser.add_argument("--experiment", default="new_feature")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--batch", type=int, default=1, help="Users per request")
+    parser.add_argument("--check", action="store_true", help="Compare with offline")
+    args = parser.parse_args()
+
+    address = {"host": args.host, "port": args.port, "unix": args.unix}
+    if args.check:
+        mismatches = asyncio.run(check(address, args.experiment))
+        if mismatches:
+            raise SystemExit(f"❌ {mismatches:,} users differ from Experiment.assign")
+        print("✅ The service matches Experiment.assign")
+
+    results = asyncio.run(
+        run(
+            address,
+            args.experiment,
+            args.concurrency,
+            args.seconds,
+            args.batch,
+        )
+    )
+    print(
+        f"✅ {results['requests']:,} requests ({results['errors']:,} errors) "
+        f"in {args.seconds:g}s with {args.concurrency} connections\n"
+        f"   {results['rps']:,.0f} requests/s, "
+        f"{results['users_per_second']:,.0f} users/s\n"
+        f"   p50 {results['p50_ms']:.2f} ms, p99 {results['p99_ms']:.2f} ms, "
+        f"max {results['max_ms']:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+###########################################################
+# 🎓 Professor: Apostolos Filippas
+# 📘 Class:     E-Commerce
+# 📋 Topic:     Means, covariances and correlations in one pass
+# 🚫 Note:      Please do not share this script with people
+#               outside the class without my permission.
+###########################################################
+
+# df.corr() needs the whole table in memory. A correlation only needs
+# a few running totals per pair of columns, though:
+#
+#   n     -> rows where both columns have a value
+#   mean  -> mean of each column over those rows
+#   C     -> sum of (x - mean_x) * (y - mean_y), the "co-moment"
+#   S     -> sum of (x - mean_x) ** 2, for each column of the pair
+#
+# We compute these for a chunk with a few matrix products, and combine
+# chunks with the update formulas of Chan, Golub & LeVeque (1979).
+# Working with distances from the mean (instead of raw sums of squares)
+# keeps the results accurate even for large values such as totalvalue.
+#
+# Like df.corr(), each pair of columns uses the rows where both have a
+# value ("pairwise complete" observations).
+
+import numpy as np
+import pandas as pd
+
+
+class CovarianceAccumulator:
+    """Running means, covariances and correlations of several columns
+
+    acc = CovarianceAccumulator(["finsqft", "totalvalue", "bedroom", "lotsize"])
+    for chunk in read_blocks("data/homes.csv", acc.columns):
+        acc.update(chunk)
+    acc.corr()            # same as df[columns].corr()
+
+    Accumulators from different chunks or processes combine with merge().
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.n = np.zeros((k, k))
+        # mean[i, j]: mean of column i over the rows where i and j are present
+        self.mean = np.zeros((k, k))
+        self.comoment = np.zeros((k, k))
+        # squares[i, j]: sum of squared distances of column i from mean[i, j]
+        self.squares = np.zeros((k, k))
+
+    def update(self, data):
+        """Add a chunk: a DataFrame with our columns, or an (n x k) array"""
+        if isinstance(data, pd.DataFrame):
+            data = data[self.columns].to_numpy(dtype=np.float64)
+        x = np.asarray(data, dtype=np.float64)
+        valid = ~np.isnan(x)
+        w = valid.astype(np.float64)
+
+        # Shift by the chunk's column means first, so that the products
+        # below stay small and no precision is lost when subtracting
+        with np.errstate(invalid="ignore"):
+            shift = np.nanmean(np.where(valid, x, np.nan), axis=0)
+        shift = np.nan_to_num(shift)
+        y = np.where(valid, x - shift, 0.0)
+
+        n = w.T @ w
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(n > 0, (y.T @ w) / n, 0.0)
+        comoment = y.T @ y - n * mean * mean.T
+        squares = (y * y).T @ w - n * mean**2
+
+        self._combine(n, mean + shift[:, None], comoment, squares)
+        return self
+
+    def merge(self, other):
+        """Fold in an accumulator built on other rows"""
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge accumulators over different columns")
+        self._combine(other.n, other.mean, other.comoment, other.squares)
+        return self
+
+    def _combine(self, n_b, mean_b, comoment_b, squares_b):
+        n_a, mean_a = self.n, self.mean
+        n = n_a + n_b
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weight = np.where(n > 0, n_a * n_b / n, 0.0)
+            share_b = np.where(n > 0, n_b / n, 0.0)
+        delta = mean_b - mean_a
+        self.comoment = self.comoment + comoment_b + delta * delta.T * weight
+        self.squares = self.squares + squares_b + delta**2 * weight
+        self.mean = mean_a + delta * share_b
+        self.n = n
+
+    def _frame(self, values):
+        return pd.DataFrame(values, index=self.columns, columns=self.columns)
+
+    def means(self):
+        """Mean of every column (over all rows where it has a value)"""
+        return pd.Series(np.diag(self.mean), index=self.columns)
+
+    def cov(self, ddof=1):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = np.where(self.n > ddof, self.comoment / (self.n - ddof), np.nan)
+        return self._frame(values)
+
+    def corr(self):
+        """Pearson correlations, like DataFrame.corr()"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = self.comoment / np.sqrt(self.squares * self.squares.T)
+        values = np.where(self.n > 1, np.clip(values, -1, 1), np.nan)
+        return self._frame(values)
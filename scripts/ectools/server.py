@@ -0,0 +1,271 @@
+###########################################################
+# 🎓 Professor: Apostolos Filippas
+# 📘 Class:     E-Commerce
+# 📋 Topic:     A local assignment service
+# 🚫 Note:      Please do not share this script with people
+#               outside the class without my permission.
+###########################################################
+
+# A website does not run our scripts: when a user shows up, it asks a
+# service "which arm is user 42 in?". Because assignment.py computes
+# the arm from a hash of (experiment, user), the service needs no
+# database of assignments, and it gives exactly the same answers as
+# Experiment.assign in a notebook.
+#
+# The service is a small HTTP server written with asyncio (standard
+# library only), listening on a local port or a Unix socket:
+#
+#   GET  /assign?experiment=new_feature&user=42
+#        -> {"experiment": "new_feature", "user": 42, "arm": "Treatment"}
+#   POST /assign  {"experiment": "new_feature", "users": [1, 2, "abc"]}
+#        -> {"experiment": "new_feature", "arms": ["Control", ...]}
+#   GET  /health
+#
+# An experiment's arms, weights and salt come from the request (arms
+# and weights comma-separated in a GET), else from an --experiments
+# JSON file, e.g. {"new_feature": {"arms": ["Control", "Treatment"],
+# "weights": [9, 1]}}, else the defaults of Experiment. Building an
+# Experiment hashes its name, so the most recently used ones are kept
+# in a small LRU cache.
+#
+# Whole numbers are integer user IDs whatever their JSON type (42.0 is
+# user 42), and in a GET a user made of digits is the integer user ID,
+# as in the data. 7 and "7" are different users (see hash_users), so
+# use a POST for string IDs made of digits.
+#
+# Start it with `make serve` and load-test it with `make loadtest`.
+
+import argparse
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from ectools.assignment import Experiment
+
+CACHE_SIZE = 1024  # Experiments kept in the LRU cache
+MAX_BODY = 64 * 2**20  # Largest request body, in bytes
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ExperimentCache:
+    """The most recently used Experiment objects, by configuration
+
+    cache = ExperimentCache({"new_feature": {"weights": [9, 1]}})
+    cache.get("new_feature")                        # built once, then reused
+    cache.get("new_feature", weights=[1, 1])        # a different entry
+    """
+
+    def __init__(self, configs=None, size=CACHE_SIZE):
+        self.configs = configs or {}
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, name, arms=None, weights=None, salt=None):
+        """Experiment with these settings; missing ones come from the configs"""
+        config = self.configs.get(name, {})
+        arms = tuple(arms or config.get("arms", ("Control", "Treatment")))
+        weights = weights or config.get("weights")
+        weights = None if weights is None else tuple(float(w) for w in weights)
+        salt = config.get("salt", "") if salt is None else salt
+
+        key = (name, arms, weights, salt)
+        experiment = self.entries.get(key)
+        if experiment is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return experiment
+        self.misses += 1
+        experiment = Experiment(name, arms, weights, salt)
+        self.entries[key] = experiment
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return experiment
+
+
+def assign(experiment, users):
+    """Arm of every user in a list of JSON user IDs (numbers or strings)"""
+    if all(type(u) is int for u in users):
+        return experiment.assign(np.array(users, dtype=np.int64)).tolist()
+    # Mixed IDs: hash_users treats whole numbers (42, 42.0) as integers
+    ids = np.empty(len(users), dtype=object)
+    ids[:] = users
+    return experiment.assign(ids).tolist()
+
+
+def _user_id(text):
+    return int(text) if text.lstrip("-").isdigit() else text
+
+
+def _split(text):
+    return None if text is None else text.split(",")
+
+
+class AssignmentServer:
+    """Answers assignment requests over HTTP/1.1 (with keep-alive)
+
+    server = AssignmentServer(ExperimentCache())
+    asyncio.run(server.serve(port=8000))        # or serve(unix="temp/assign.sock")
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.requests = 0
+
+    def handle(self, method, target, body):
+        """Status and JSON answer of one request"""
+        url = urlsplit(target)
+        if url.path == "/health":
+            return 200, {
+                "status": "ok",
+                "requests": self.requests,
+                "experiments": len(self.cache),
+                "cache_hits": self.cache.hits,
+                "cache_misses": self.cache.misses,
+            }
+        if url.path != "/assign":
+            raise HTTPError(404, f"No such path: {url.path}")
+
+        if method == "GET":
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            if "experiment" not in query or "user" not in query:
+                raise HTTPError(400, "Need the experiment and user parameters")
+            weights = _split(query.get("weights"))
+            arms, salt = _split(query.get("arms")), query.get("salt")
+        elif method == "POST":
+            try:
+                query = json.loads(body)
+            except ValueError:
+                raise HTTPError(400, "The body is not valid JSON")
+            if not isinstance(query, dict) or "experiment" not in query:
+                raise HTTPError(400, "Need an experiment")
+            if not isinstance(query.get("users"), list):
+                raise HTTPError(400, "Need a list of users")
+            arms, weights = query.get("arms"), query.get("weights")
+            salt = query.get("salt")
+        else:
+            raise HTTPError(405, f"Use GET or POST, not {method}")
+
+        try:
+            experiment = self.cache.get(query["experiment"], arms, weights, salt)
+        except (TypeError, ValueError) as error:
+            raise HTTPError(400, f"Bad experiment settings: {error}")
+        users = [_user_id(query["user"])] if method == "GET" else query["users"]
+        try:
+            arms = assign(experiment, users)
+        except (TypeError, ValueError, OverflowError) as error:
+            raise HTTPError(400, f"Bad user IDs: {error}")
+        if method == "GET":
+            return 200, {
+                "experiment": experiment.name,
+                "user": users[0],
+                "arm": arms[0],
+            }
+        return 200, {"experiment": experiment.name, "arms": arms}
+
+    async def _read_request(self, reader):
+        """Method, target, keep-alive and body of the next request (None at the end)"""
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400, "Bad request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(400, "Bad Content-Length")
+        if not 0 <= length <= MAX_BODY:
+            raise HTTPError(400, "Bad or too large Content-Length")
+        body = await reader.readexactly(length) if length else b""
+        keep_alive = headers.get("connection", "").lower() != "close"
+        return method, target, keep_alive and version == "HTTP/1.1", body
+
+    async def _connection(self, reader, writer):
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, target, keep_alive, body = request
+                    self.requests += 1
+                    status, answer = self.handle(method, target, body)
+                except HTTPError as error:
+                    status, answer = error.status, {"error": str(error)}
+                payload = json.dumps(answer).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                    "\r\n".encode() + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8000, unix=None):
+        """Start listening; returns the asyncio server"""
+        if unix:
+            if os.path.exists(unix):
+                os.remove(unix)  # Left over from an earlier run
+            return await asyncio.start_unix_server(self._connection, path=unix)
+        return await asyncio.start_server(self._connection, host, port)
+
+    async def serve(self, host="127.0.0.1", port=8000, unix=None):
+        server = await self.start(host, port, unix)
+        where = unix or f"http://{host}:{port}"
+        print(f"✅ Assigning users at {where} (Ctrl+C to stop)")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local treatment assignment service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--unix", help="Listen on this Unix socket instead")
+    parser.add_argument("--experiments", help="JSON file of experiment settings")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE)
+    args = parser.parse_args()
+
+    configs = {}
+    if args.experiments:
+        with open(args.experiments) as f:
+            configs = json.load(f)
+    server = AssignmentServer(ExperimentCache(configs, args.cache_size))
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        print(f"\n👋 Served {server.requests:,} requests")
+
+
+if __name__ == "__main__":
+    main()
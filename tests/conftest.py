@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The helpers live in scripts/ectools, which the scripts import directly
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
@@ -0,0 +1,75 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ectools.assignment import Experiment
+from ectools.loadtest import check, connect, request
+from ectools.server import AssignmentServer, ExperimentCache, HTTPError
+
+
+@pytest.mark.parametrize("weights", [[np.nan, 1], [np.inf, 1], [1, -np.inf]])
+def test_weights_must_be_finite(weights):
+    with pytest.raises(ValueError):
+        Experiment("new_feature", weights=weights)
+
+
+def test_server_rejects_nan_weights():
+    server = AssignmentServer(ExperimentCache())
+    body = b'{"experiment": "new_feature", "users": [1], "weights": ["nan", "1"]}'
+    with pytest.raises(HTTPError) as error:
+        server.handle("POST", "/assign", body)
+    assert error.value.status == 400
+
+
+def test_values_outside_the_bin_edges_raise():
+    df = pd.DataFrame({"user": range(4), "earnings": [10, 60, 400, 28_000]})
+    experiment = Experiment("new_feature")
+    with pytest.raises(ValueError):
+        experiment.assign_stratified(df, "earnings", bins={"earnings": [0, 50, 500]})
+    bins = {"earnings": [0, 50, np.inf]}
+    assert len(experiment.assign_stratified(df, "earnings", bins=bins)) == 4
+
+
+def test_stratified_splits_are_exact():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "user": rng.permutation(10_000),
+            "city": rng.choice(["Athens", "Sparta", "Thebes", "Delphi"], 10_000),
+            "age": rng.normal(40, 10, 10_000),
+        }
+    )
+    experiment = Experiment("new_feature", ["Control", "A", "B"], weights=[2, 1, 1])
+    bins = {"age": 4}
+    df["arm"] = experiment.assign_stratified(df, ["city", "age"], bins=bins)
+
+    counts = pd.crosstab([df["city"], pd.qcut(df["age"], 4)], df["arm"])
+    sizes = counts.sum(axis=1).to_numpy()
+    quotas = counts[["Control", "A", "B"]].to_numpy()
+    assert (np.abs(quotas - sizes[:, None] * experiment.weights) < 1).all()
+    # The same users get the same arms in any row order
+    shuffled = df.sample(frac=1, random_state=1)
+    again = experiment.assign_stratified(shuffled, ["city", "age"], bins=bins)
+    assert (again == shuffled["arm"].to_numpy()).all()
+
+
+def test_server_matches_offline_assignment(tmp_path):
+    async def run():
+        server = AssignmentServer(ExperimentCache())
+        address = {"unix": str(tmp_path / "assign.sock")}
+        async with await server.start(**address):
+            mismatches = await check(address, "new_feature", users=5000)
+            reader, writer = await connect(**address)
+            users = [42, 42.0, "abc", -7, 2**40]
+            payload = {"experiment": "other", "users": users, "weights": [9, 1]}
+            _, answer = await request(reader, writer, "POST", "/assign", payload)
+            writer.close()
+            await asyncio.sleep(0.1)  # Let the server see both connections close
+        return mismatches, answer["arms"]
+
+    mismatches, arms = asyncio.run(run())
+    offline = Experiment("other", weights=[9, 1])
+    assert mismatches == 0
+    assert arms == [offline.assign_one(u) for u in [42, 42, "abc", -7, 2**40]]
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from ectools.balance import categorical_balance, numeric_balance
+
+
+def _users(rows=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {
+            "treatment": rng.choice(["Control", "A", "B"], size=rows),
+            "age": rng.normal(40, 10, size=rows),
+            "earnings": rng.lognormal(5, 1, size=rows),
+            "city": rng.choice(["Athens", "Sparta", "Thebes"], size=rows),
+            "gender": rng.choice(["F", "M"], size=rows),
+        }
+    )
+    df.loc[::11, "age"] = np.nan
+    return df
+
+
+def test_numeric_balance_matches_welch_t_tests():
+    df = _users()
+    table = numeric_balance(df).set_index(["variable", "arm"])
+    control = df[df["treatment"] == "Control"]
+    for (variable, arm), row in table.iterrows():
+        treated = df[df["treatment"] == arm]
+        a, b = treated[variable].dropna(), control[variable].dropna()
+        expected = stats.ttest_ind(a, b, equal_var=False)
+        assert row["arm_n"] == len(a) and row["control_n"] == len(b)
+        np.testing.assert_allclose(row["difference"], a.mean() - b.mean(), rtol=1e-10)
+        np.testing.assert_allclose(row["t_statistic"], expected.statistic, rtol=1e-10)
+        np.testing.assert_allclose(row["p_value"], expected.pvalue, rtol=1e-8)
+
+
+def test_categorical_balance_matches_chi2_contingency():
+    df = _users()
+    table = categorical_balance(df).set_index("variable")
+    for variable in ["city", "gender"]:
+        crosstab = pd.crosstab(df[variable], df["treatment"])
+        chi2, p_value, dof, _ = stats.chi2_contingency(crosstab, correction=False)
+        np.testing.assert_allclose(table.loc[variable, "chi2"], chi2, rtol=1e-10)
+        np.testing.assert_allclose(table.loc[variable, "p_value"], p_value, rtol=1e-8)
+        assert table.loc[variable, "dof"] == dof
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from ectools.buckets import BucketMoments, ratings_evolution
+
+
+def test_merged_buckets_match_groupby():
+    rng = np.random.default_rng(0)
+    keys = rng.integers(-30, 120, size=50_000)
+    values = rng.normal(4, 1, size=50_000)
+    left, right = BucketMoments(), BucketMoments()
+    left.update(keys[:20_000], values[:20_000])
+    right.update(keys[20_000:] + 0.0, values[20_000:])
+    table = left.merge(right).table()
+
+    expected = pd.Series(values).groupby(keys).agg(["count", "mean", "var"])
+    assert table["key"].tolist() == expected.index.tolist()
+    assert table["num_obs"].tolist() == expected["count"].tolist()
+    np.testing.assert_allclose(table["mean"], expected["mean"], rtol=1e-12)
+    np.testing.assert_allclose(table["var"], expected["var"], rtol=1e-9)
+
+
+def test_ratings_evolution_matches_5_inflation(tmp_path):
+    rng = np.random.default_rng(0)
+    days = rng.integers(12_000, 17_500, size=20_000)
+    dates = pd.Series(days.astype("datetime64[D]")).dt.strftime("%Y-%m-%d")
+    df = pd.DataFrame({"date": dates, "score": rng.uniform(1, 5, size=len(days))})
+    df.loc[::50, "date"] = None
+    df.to_csv(tmp_path / "ratings.csv", index=False)
+
+    table = ratings_evolution(tmp_path / "ratings.csv", block_rows=3000)
+    when = pd.to_datetime(df["date"])
+    expected = (
+        df.groupby([when.dt.year.rename("year"), when.dt.month.rename("month")])
+        .agg(num_obs=("score", "count"), mean=("score", "mean"), var=("score", "var"))
+        .reset_index()
+    )
+    assert (
+        table["t"].tolist()
+        == (12 * (expected["year"] - 2007) + expected["month"]).tolist()
+    )
+    assert table["num_obs"].tolist() == expected["num_obs"].tolist()
+    np.testing.assert_allclose(table["score_mean"], expected["mean"], rtol=1e-12)
+    np.testing.assert_allclose(table["score_var"], expected["var"], rtol=1e-9)
@@ -0,0 +1,14 @@
+import pandas as pd
+
+from ectools.cache import build_cache
+from ectools.colstore import open_table
+
+
+def test_block_build_matches_read_csv(tmp_path):
+    # A missing ID and a string in a number column only show up late
+    path = tmp_path / "data.csv"
+    path.write_text("id,city,zip\n" + "1,Athens,100\n" * 5 + ",Sparta,ABC\n2,,101\n")
+
+    build_cache(path, tmp_path / "table", block_rows=2)
+    table = open_table(tmp_path / "table").to_pandas()
+    pd.testing.assert_frame_equal(table, pd.read_csv(path))
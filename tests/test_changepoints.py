@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from ectools.changepoints import changepoints
+
+
+def _panel(cars=200, periods=40, seed=0):
+    rng = np.random.default_rng(seed)
+    car = np.repeat([f"{i:032x}" for i in range(cars)], periods)
+    time_m = np.tile(np.arange(periods), cars)
+    # Every other car doubles its price half-way through
+    shift = np.where(
+        (time_m >= periods // 2) & (np.arange(len(car)) // periods % 2 == 0), 2, 1
+    )
+    price = 50 * shift * rng.lognormal(0, 0.02, size=len(car))
+    return pd.DataFrame({"car": car, "time_m": time_m, "price_daily": price})
+
+
+def test_pool_matches_serial():
+    df = _panel().sample(frac=1, random_state=0)
+    serial = changepoints(df)
+    pooled = changepoints(df, workers=2, chunks_per_worker=3)
+    pd.testing.assert_frame_equal(pooled, serial)
+
+
+def test_finds_the_shifts():
+    df = _panel()
+    breaks = changepoints(df)
+    shifted = sorted(df["car"].unique()[::2])
+    assert sorted(breaks["car"]) == shifted
+    assert (breaks["time_m"] == 20).all()
+    np.testing.assert_allclose(
+        breaks["level_after"] / breaks["level_before"], 2, rtol=0.02
+    )
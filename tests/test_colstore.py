@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ectools.colstore import append_table, open_table, write_table
+from ectools.ingest import PricePanel
+
+
+def _rows(dates, cars, time_m):
+    return pd.DataFrame({"date": dates, "car": cars, "time_m": time_m})
+
+
+def test_failed_append_leaves_no_bytes_behind(tmp_path):
+    path = tmp_path / "table"
+    write_table(_rows(["2020-01-01", "2020-01-02"], ["a", "b"], [1, 2]), path)
+
+    # time_m arrives as float: the append must fail before writing anything
+    bad = _rows(["2020-01-03", "2020-01-04"], ["c", "d"], [3.0, np.nan])
+    with pytest.raises(TypeError):
+        append_table(bad, path)
+    append_table(_rows(["2020-01-05"], ["e"], [5]), path)
+
+    table = open_table(path)
+    assert len(table) == 3
+    assert table["date"].tolist() == ["2020-01-01", "2020-01-02", "2020-01-05"]
+    assert table["car"].tolist() == ["a", "b", "e"]
+    assert table["time_m"].tolist() == [1, 2, 5]
+    days = table.to_pandas(["date"], dates=True)["date"]
+    assert days.dt.strftime("%Y-%m-%d").tolist() == table["date"].tolist()
+    # The strings of the failed append were not kept either
+    assert table.categories("car").tolist() == ["a", "b", "e"]
+
+
+def test_failed_panel_append_keeps_rows_and_aggregates(tmp_path):
+    panel = PricePanel(tmp_path / "panel")
+    panel.append(_rows(["2020-01-01", "2020-01-02"], ["a", "b"], [1, 2]))
+
+    with pytest.raises(ValueError):
+        panel.append(_rows(["2020-01-03"], ["c"], [np.nan]))
+    panel.append(_rows(["2020-01-05"], ["a"], [5]))
+
+    assert panel.rows["car"].tolist() == ["a", "b", "a"]
+    df_changes = panel.df_changes()
+    assert df_changes["n"].tolist() == [2, 1]
+    assert df_changes["end_t"].tolist() == [5, 2]
+    assert panel.periods() == [1, 2, 5]
+
+
+def test_long_strings_are_not_padded(tmp_path):
+    values = [f"s{i}" for i in range(20_000)]
+    values[7] = "é" * 5000
+    write_table(pd.DataFrame({"text": values}), tmp_path / "table")
+    append_table(pd.DataFrame({"text": ["ünï", None, "s5"]}), tmp_path / "table")
+
+    table = open_table(tmp_path / "table")
+    size = sum(f.stat().st_size for f in (tmp_path / "table").iterdir())
+    assert size < 1_000_000
+    assert table["text"].tolist()[:20_000] == values
+    assert table["text"].tolist()[20_000:] == ["ünï", np.nan, "s5"]
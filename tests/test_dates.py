@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from ectools.colstore import append_table, open_table, write_table
+
+
+def test_date_parts_are_int32_and_match_pandas(tmp_path):
+    dates = ["2009-08-31", "2004-02-29", "2017-12-31", "2009-08-31"]
+    write_table(pd.DataFrame({"date": dates}), tmp_path / "table")
+
+    df = open_table(tmp_path / "table").to_pandas(dates=True)
+    expected = pd.to_datetime(pd.Series(dates))
+    for part in ["days", "year", "month", "months"]:
+        assert df[f"date_{part}"].dtype == np.int32
+    assert (df["date"] == expected).all()
+    assert df["date_year"].tolist() == expected.dt.year.tolist()
+    assert df["date_month"].tolist() == expected.dt.month.tolist()
+    months = 12 * (expected.dt.year - 1970) + expected.dt.month - 1
+    assert df["date_months"].tolist() == months.tolist()
+
+
+def test_missing_and_invalid_dates_are_na(tmp_path):
+    path = tmp_path / "table"
+    write_table(pd.DataFrame({"date": ["2020-01-01", None, "2017-02-30"]}), path)
+    append_table(pd.DataFrame({"date": ["2021-05-05"]}), path)
+
+    df = open_table(path).to_pandas(dates=True)
+    assert df["date_year"].dtype == "Int32"
+    assert df["date_year"].tolist() == [2020, pd.NA, pd.NA, 2021]
+    assert df["date"].isna().tolist() == [False, True, True, False]
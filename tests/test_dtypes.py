@@ -0,0 +1,15 @@
+import numpy as np
+import pandas as pd
+
+from ectools.dtypes import compact_dtypes
+
+
+def test_integers_stay_at_least_32_bits():
+    df = pd.DataFrame(
+        {"time_m": [1, 2, 7], "user": [1, 500, 20_000], "big": [0, 1, 2**40]}
+    )
+    df = compact_dtypes(df)
+    assert df["time_m"].dtype == np.int32
+    assert df["user"].dtype == np.int32
+    assert df["big"].dtype == np.int64
+    assert (12 * df["time_m"]).tolist() == [12, 24, 84]
@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+from ectools.hashing import hash_values
+
+
+def test_whole_numbers_hash_the_same_whatever_their_dtype():
+    ids = np.arange(-5, 1000)
+    expected = hash_values(ids)
+    assert (hash_values(ids.astype(np.float64)) == expected).all()
+    assert (hash_values(ids.astype(np.int32)) == expected).all()
+    assert (hash_values(ids.astype(object)) == expected).all()
+
+
+def test_strings_and_other_numbers_keep_their_own_hash():
+    strings = np.array([f"{i:032x}" for i in range(1000)], dtype=object)
+    assert (hash_values(strings) == pd.util.hash_array(strings)).all()
+    mixed = np.array([7, "7", 7.5, 7.0], dtype=object)
+    hashes = hash_values(mixed)
+    assert hashes[0] == hashes[3] and len(set(hashes[:3])) == 3
+    assert hashes[2] == hash_values(np.array([7.5]))[0]
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from ectools.moments import CovarianceAccumulator
+from ectools.regression import OnlineLinregress, linregress
+
+
+def _homes(rows=10_000, seed=0):
+    rng = np.random.default_rng(seed)
+    finsqft = rng.normal(2000, 500, size=rows)
+    df = pd.DataFrame(
+        {
+            "finsqft": finsqft,
+            "totalvalue": 1e6 + 150 * finsqft + rng.normal(0, 5e4, size=rows),
+            "bedroom": rng.integers(1, 6, size=rows).astype(np.float64),
+        }
+    )
+    df.loc[rng.random(rows) < 0.1, "bedroom"] = np.nan
+    return df
+
+
+def test_covariance_matches_pandas_across_chunks():
+    df = _homes()
+    left, right = CovarianceAccumulator(df.columns), CovarianceAccumulator(df.columns)
+    for start in range(0, 6000, 1000):
+        left.update(df.iloc[start : start + 1000])
+    right.update(df.iloc[6000:])
+    acc = left.merge(right)
+
+    np.testing.assert_allclose(acc.cov(), df.cov(), rtol=1e-9)
+    np.testing.assert_allclose(acc.corr(), df.corr(), rtol=1e-9)
+
+
+def test_linregress_matches_scipy():
+    df = _homes()
+    expected = stats.linregress(df["finsqft"], df["totalvalue"])
+    fit = OnlineLinregress()
+    for start in range(0, len(df), 3000):
+        chunk = df.iloc[start : start + 3000]
+        fit.update(chunk["finsqft"], chunk["totalvalue"])
+    for result in [fit.result(), linregress(df["finsqft"], df["totalvalue"])]:
+        np.testing.assert_allclose(result, expected, rtol=1e-7)
+        np.testing.assert_allclose(
+            result.intercept_stderr, expected.intercept_stderr, rtol=1e-7
+        )
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from ectools.sketches import GroupedHyperLogLog, KLLSketch
+
+
+def test_kll_quantiles_within_rank_error():
+    values = np.random.default_rng(0).lognormal(size=200_000)
+    left, right = KLLSketch(seed=1), KLLSketch(seed=2)
+    for chunk in np.array_split(values[:100_000], 10):
+        left.update(chunk)
+    right.update(values[100_000:])
+    sketch = left.merge(right)
+
+    q = np.linspace(0.01, 0.99, 99)
+    ranks = np.searchsorted(np.sort(values), sketch.quantile(q)) / len(values)
+    assert sketch.n == len(values)
+    assert np.abs(ranks - q).max() <= sketch.rank_error()
+
+
+def test_kll_bin_counts_match_pd_cut():
+    values = np.random.default_rng(0).exponential(2, size=100_000)
+    sketch = KLLSketch().update(values)
+    edges = [0, 0.5, 1, 2, 4, 8, np.inf]
+
+    expected = pd.Series(pd.cut(values, edges, right=False)).value_counts(sort=False)
+    counts = sketch.bin_counts(edges)
+    error = np.abs(counts - expected.to_numpy()) / len(values)
+    assert error.max() <= 2 * sketch.rank_error()
+
+
+def test_hyperloglog_matches_nunique():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "group": rng.integers(0, 20, size=300_000),
+            "user": rng.integers(0, 200_000, size=300_000).astype(np.float64),
+        }
+    )
+    df.loc[::7, "user"] = np.nan
+    sketch = GroupedHyperLogLog("group", "user", exact_limit=1000)
+    for start in range(0, len(df), 50_000):
+        sketch.update(df.iloc[start : start + 50_000])
+    small = df[df["group"] == 0].head(500)
+    exact = GroupedHyperLogLog("group", "user").update(small).result()
+
+    result = sketch.result().set_index("group")["user_nunique"].sort_index()
+    expected = df.groupby("group")["user"].nunique()
+    # The standard error is 1.6% at precision 12; 6 of them is never reached
+    assert (np.abs(result / expected - 1) < 6 * 1.04 / 64).all()
+    assert exact["user_nunique"].tolist() == [small["user"].nunique()]
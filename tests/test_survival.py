@@ -0,0 +1,36 @@
+import numpy as np
+from scipy import stats
+
+from ectools.survival import kaplan_meier
+
+
+def test_kaplan_meier_matches_scipy():
+    rng = np.random.default_rng(0)
+    durations = rng.integers(1, 40, size=5000).astype(np.float64)
+    exited = rng.random(5000) < 0.7
+
+    table = kaplan_meier(durations, exited)
+    data = stats.CensoredData(uncensored=durations[exited], right=durations[~exited])
+    sf = stats.ecdf(data).sf
+    survival = sf.evaluate(table["duration"].to_numpy())
+    interval = sf.confidence_interval(0.95)
+
+    np.testing.assert_allclose(table["survival"], survival, rtol=1e-12)
+    np.testing.assert_allclose(
+        table["lower"], interval.low.evaluate(table["duration"].to_numpy()), atol=1e-3
+    )
+    assert table["at_risk"].iloc[0] == len(durations)
+    assert table["exits"].sum() == exited.sum()
+
+
+def test_kaplan_meier_strata_are_separate_curves():
+    rng = np.random.default_rng(1)
+    durations = rng.integers(1, 20, size=2000)
+    exited = rng.random(2000) < 0.5
+    strata = rng.choice(["a", "b"], size=2000)
+
+    table = kaplan_meier(durations, exited, strata)
+    for stratum in ["a", "b"]:
+        alone = kaplan_meier(durations[strata == stratum], exited[strata == stratum])
+        curve = table[table["stratum"] == stratum].drop(columns="stratum")
+        np.testing.assert_allclose(curve.to_numpy(float), alone.to_numpy(float))